@@ -0,0 +1,19 @@
+# the default arena, precomputed from map.txt as (x, y, symbol) tuples so a launch without
+# map.txt beside it does not need to read or parse anything. regenerate it if map.txt changes.
+DEFAULT_ARENA = (
+    (6, 0, '#'), (7, 0, '#'), (8, 0, '#'), (9, 0, '#'), (10, 0, '#'), (11, 0, '#'),
+    (12, 0, '#'), (2, 1, '#'), (3, 1, '#'), (4, 1, '#'), (5, 1, '#'), (13, 1, '#'),
+    (14, 1, '#'), (15, 1, '#'), (16, 1, '#'), (1, 2, '#'), (9, 2, '*'), (17, 2, '#'),
+    (0, 3, '#'), (18, 3, '#'), (0, 4, '#'), (18, 4, '#'), (0, 5, '#'), (9, 5, 'D'),
+    (18, 5, '#'), (0, 6, '#'), (18, 6, '#'), (0, 7, '#'), (17, 7, '%'), (18, 7, '#'),
+    (0, 8, '#'), (17, 8, '%'), (18, 8, '#'), (0, 9, '#'), (2, 9, '~'), (3, 9, '~'),
+    (4, 9, '~'), (5, 9, '~'), (18, 9, '#'), (0, 10, '#'), (1, 10, '~'), (2, 10, '~'),
+    (3, 10, '~'), (4, 10, '~'), (18, 10, '#'), (0, 11, '#'), (18, 11, '#'), (0, 12, '#'),
+    (1, 12, '-'), (2, 12, '-'), (3, 12, '-'), (4, 12, '-'), (5, 12, '-'), (6, 12, '-'),
+    (12, 12, '-'), (13, 12, '-'), (14, 12, '-'), (15, 12, '-'), (16, 12, '-'), (17, 12, '-'),
+    (18, 12, '#'), (0, 13, '#'), (6, 13, '+'), (9, 13, '@'), (12, 13, '+'), (18, 13, '#'),
+    (0, 14, '#'), (1, 14, '#'), (2, 14, '#'), (3, 14, '#'), (4, 14, '#'), (5, 14, '#'),
+    (6, 14, '#'), (7, 14, '#'), (8, 14, '#'), (9, 14, '#'), (10, 14, '#'), (11, 14, '#'),
+    (12, 14, '#'), (13, 14, '#'), (14, 14, '#'), (15, 14, '#'), (16, 14, '#'), (17, 14, '#'),
+    (18, 14, '#'),
+)
@@ -1,13 +1,37 @@
-from mapObject import getMapObjects, getWeapons, getShields, PLAYER_SYMBOL, DRAGON_SYMBOL
-import curses
+import time
+from contextlib import contextmanager
+
+# how long each step of starting up took, as (step, seconds), for --startup-profile
+startup_timings = []
+launch_time = time.perf_counter()
+
+@contextmanager
+def timed(step: str):
+    began = time.perf_counter()
+    yield
+    startup_timings.append((step, time.perf_counter() - began))
+
+with timed('import mapObject'):
+    from mapObject import getMapObjects, getWeapons, getShields, get_journal, set_journal, set_journaled, Journal, PLAYER_SYMBOL, DRAGON_SYMBOL
+with timed('import arena'):
+    from arena import DEFAULT_ARENA
 import random
 import heapq
+import math
+import os
+import sys
+# curses and argparse are only needed to launch the game, and fireField (which pulls in numpy)
+# is not needed for the first frame, so they are imported later (see warm_imports)
 
 map_file = 'map.txt'
 
 BASH_CHANCE = 0.25
 BURN_CHANCE = 0.5
+DEFAULT_TICKS_PER_SECOND = 4
+DEFAULT_FRAMES_PER_SECOND = 30
+STARTUP_BUDGET_MS = 60
 ORTHOGONALS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+FIRE_SYMBOL = '^'
 DXY_TO_COMMAND = {(-1, 0): 'h', (1, 0): 'l', (0, -1): 'k', (0, 1): 'j', (0,0): '.'}
 
 def load_map(map_file: str) -> list:
@@ -22,6 +46,14 @@ def load_map(map_file: str) -> list:
                     map_data.append((x, y, map_objects[symbol]))
     return map_data
 
+def load_arena() -> list:
+    # load map.txt if it is there, so the arena can still be rearranged, and the built-in
+    # copy of the default arena otherwise. return a list of tuples of the form (x, y, MapObject).
+    if os.path.exists(map_file):
+        return load_map(map_file)
+    map_objects = getMapObjects()
+    return [(x, y, map_objects[symbol]) for x, y, symbol in DEFAULT_ARENA]
+
 def get_other_mob(map_data: list, symbol: str) -> tuple:
     # return the tuple (x, y, MapObject) of the other mobile object in map_data.
     for motuple in map_data:
@@ -44,13 +76,16 @@ def display_map(stdscr, map_data: list):
     for x, y, map_object in map_data:
         if map_object.get_destructible() and not map_object.get_mobile():
             stdscr.addch(y, x, map_object.get_symbol())
+    # display burning terrain
+    if global_fire is not None:
+        for x, y in global_fire.get_burning_cells():
+            stdscr.addch(y, x, FIRE_SYMBOL)
     # display mobile objects
     for x, y, map_object in map_data:
         if map_object.get_mobile():
             stdscr.addch(y, x, map_object.get_symbol())
 
 def extract_map_object(map_data: list, symbol: str) -> tuple:
-    map_objects = getMapObjects()
     # extract the map object with the given symbol from map_data. return the tuple (x, y, MapObject).
     for motuple in map_data:
         _, _, map_object = motuple
@@ -58,6 +93,7 @@ def extract_map_object(map_data: list, symbol: str) -> tuple:
             return motuple
     
     # if the symbol is not found, log it, using map_objects to get the name of the object
+    map_objects = getMapObjects()
     if symbol in map_objects:
         errors = f"{map_objects[symbol].get_name()} not found in map data"
     else:
@@ -67,14 +103,50 @@ def extract_map_object(map_data: list, symbol: str) -> tuple:
 
 def move_map_object(map_data: list, symbol: str, x: int, y: int) -> list:
     # move the map object with the given symbol to the new position (x, y). return the updated map_data.
-    new_map_data = []
-    for motuple in map_data:
+    for index, motuple in enumerate(map_data):
         _, _, map_object = motuple
         if map_object.get_symbol() == symbol:
-            new_map_data.append((x, y, map_object))
-        else:
-            new_map_data.append(motuple)
-    return new_map_data
+            if get_journal() is not None:
+                get_journal().record_replace(map_data, index)
+            map_data[index] = (x, y, map_object)
+    return map_data
+
+def remove_map_object(map_data: list, motuple: tuple) -> list:
+    # remove the given (x, y, MapObject) tuple from map_data, recording it in the active journal.
+    index = map_data.index(motuple)
+    if get_journal() is not None:
+        get_journal().record_delete(map_data, index)
+    del map_data[index]
+    x, y, map_object = motuple
+    if global_fire is not None and (map_object.get_is_wood() or map_object.get_openable()):
+        global_fire.remove_fuel(x, y)
+    return map_data
+
+@contextmanager
+def recording():
+    # track whether the body of a with-block changes the world, without undoing anything.
+    # yields a function that answers that. changes go to the active journal when there is one,
+    # so an enclosing fork still undoes them; otherwise a throwaway journal is used.
+    previous = get_journal()
+    journal = previous if previous is not None else Journal()
+    set_journal(journal)
+    mark = journal.mark()
+    try:
+        yield lambda: len(journal) > mark
+    finally:
+        set_journal(previous)
+
+@contextmanager
+def fork():
+    # run the body of a with-block on the live world, then revert every change it made
+    # to map objects, map_data and the log. forks can be nested.
+    journal = Journal()
+    previous = set_journal(journal)
+    try:
+        yield journal
+    finally:
+        journal.undo()
+        set_journal(previous)
 
 def move_mob(map_data: list, symbol: str, dx: int, dy: int) -> list:
     # move the mobile map object with the given symbol by the offset (dx, dy). return the updated map_data.
@@ -96,8 +168,8 @@ def move_mob(map_data: list, symbol: str, dx: int, dy: int) -> list:
     return move_map_object(map_data, symbol, new_x, new_y)
 
 def set_quit(map_data: list):
-    global global_quit
-    global_quit = True
+    # global_quit goes through the journal like any other change, so quitting inside a fork is undone
+    set_journaled(sys.modules[__name__], 'global_quit', True)
     return map_data
 
 def direction_blocked(map_data: list, symbol: str, dx: int, dy: int) -> bool:
@@ -135,7 +207,7 @@ def open_door(map_data: list, symbol: str) -> list:
             mx, my, map_object = motuple
             if map_object.get_openable() and mx == new_x and my == new_y:
                 # remove the door
-                del map_data[map_data.index(motuple)]
+                remove_map_object(map_data, motuple)
                 log(symbol, "You open the door. It falls to the ground with a loud crash.", "The dragon tears the door off its hinges.")
 
     return map_data
@@ -190,6 +262,12 @@ def breathe_fire(map_data: list, symbol: str) -> list:
         else:
             other_mob[2].set_is_burning(True)
             log(other_symbol, "You are on fire!", "The dragon is on fire somehow!")
+
+    # the breath sets light to any wood next to its target
+    fire = get_fire(map_data)
+    ignited = [fire.ignite(other_mob[0] + dx, other_mob[1] + dy) for dx, dy in ORTHOGONALS]
+    if any(ignited):
+        log(other_symbol, "The wood next to you catches fire!", "The wood next to the dragon catches fire!")
     
     weapon_index = other_mob[2].get_weapon()
     if weapon_index:
@@ -261,7 +339,7 @@ def bash(map_data: list, symbol: str) -> list:
                         else:
                             log(symbol, f"You upgrade your shield to {getShields()[player.get_shield() + 1]}", f"The dragon upgrades its shield to {getShields()[player.get_shield() + 1]}")
                         player.set_shield(player.get_shield() + 1)
-                    del map_data[map_data.index(motuple)]
+                    remove_map_object(map_data, motuple)
     return map_data
 
 def can_quench(map_data: list, symbol: str) -> bool:
@@ -303,6 +381,50 @@ def make_action_dictionary():
 
     return action_dict
 
+def get_fire(map_data: list) -> 'FireField':
+    # return the fire simulation for the current map, creating it the first time it is needed
+    if global_fire is None:
+        from fireField import FireField
+        # journaled, so a fire first started inside a fork does not outlive it
+        set_journaled(sys.modules[__name__], 'global_fire', FireField(map_data))
+    return global_fire
+
+def spread_fire(map_data: list) -> list:
+    # advance the burning terrain by one tick. wood that burns away is removed from map_data,
+    # and mobs standing next to the flames are hurt, unless they breathe fire themselves.
+    if global_fire is None:
+        return map_data
+    burnt_out = global_fire.tick()
+    if burnt_out.any():
+        # the fire has already cleared these cells, so the wood is dropped in a single pass
+        # and journaled as one change, however many cells burned away
+        kept, burnt = [], []
+        for motuple in map_data:
+            x, y, map_object = motuple
+            (burnt if burnt_out[y, x] and not map_object.get_mobile() else kept).append(motuple)
+        if burnt:
+            if get_journal() is not None:
+                get_journal().record_contents(map_data)
+            map_data[:] = kept
+            if len(burnt) == 1:
+                log(PLAYER_SYMBOL, f"The {burnt[0][2].get_name()} burns away.")
+            else:
+                log(PLAYER_SYMBOL, f"The flames consume {len(burnt)} pieces of wood.")
+
+    heat = global_fire.get_heat()
+    for x, y, map_object in map_data:
+        if not map_object.get_mobile() or map_object.get_breath_timer() or not heat[y, x]:
+            continue
+        symbol = map_object.get_symbol()
+        if map_object.get_is_wet():
+            map_object.set_is_wet(False)
+            log(symbol, "The heat of the flames dries you off.", "The heat of the flames dries the dragon off.")
+        elif map_object.get_health() > 0 and random.random() < BURN_CHANCE:
+            map_object.set_health(map_object.get_health() - 1)
+            log(symbol, "You take 1 damage from the burning wood", "The dragon takes 1 damage from the burning wood")
+
+    return map_data
+
 def decrement_cooldowns(map_data: list) -> list:
     # decrement the move cooldown of all mobile objects in map_data. return the updated map_data.
     for motuple in map_data:
@@ -318,7 +440,7 @@ def decrement_cooldowns(map_data: list) -> list:
         player.set_health(player.get_health() - 1)
         log(PLAYER_SYMBOL, "You take 1 damage from the flames")
 
-    return map_data
+    return spread_fire(map_data)
 
 def display_valid_actions(stdscr, action_dict: dict, map_data: list, valid_actions: list):
     max_column_in_map = max([x for x, _, _ in map_data])
@@ -391,6 +513,8 @@ def find_path(start: tuple, end: tuple, blocking_objects: list) -> list:
 
 def log(symbol: str, pmessage: str, dmessage: str = "Missing message"):
     global global_log
+    if get_journal() is not None:
+        get_journal().record_append(global_log)
     global_log.append((symbol, pmessage, dmessage))
 
 def display_log(stdscr):
@@ -463,41 +587,61 @@ def game_over(stdscr, map_data: list) -> bool:
             game_over_win.addstr(row, int((game_over_width - len(message))/2), message)
 
         game_over_win.refresh()
+        # wait for the key without a timeout, even if the game was running in real time
+        stdscr.timeout(-1)
         while True:
             key = stdscr.getch()
-            if chr(key) == 'Q':
+            if key != -1 and chr(key) == 'Q':
                 return True
     return False
 
 global_quit = False
 global_log = []
+global_fire = None
+
+def draw_frame(stdscr, action_dict: dict, map_data: list) -> list:
+    # draw the whole screen (without refreshing it). return the list of valid actions for the player.
+    # erase rather than clear, so refresh only repaints the characters that changed.
+    stdscr.erase()
+    display_map(stdscr, map_data)
+    display_conditions(stdscr, map_data)
+    player = extract_map_object(map_data, PLAYER_SYMBOL)
 
-def main(stdscr):
-    global global_quit, global_log
-    map_data = load_map(map_file)
-    action_dict = make_action_dictionary()
+    # get list of all valid actions for player
+    valid_actions = [key for key in action_dict if not action_dict[key][1](map_data, player[2].get_symbol())]
+
+    display_valid_actions(stdscr, action_dict, map_data, valid_actions)
+    display_log(stdscr)
+    return valid_actions
+
+def main(stdscr, profile_startup: bool = False):
+    global global_quit, global_log, global_fire
+    with timed('load arena'):
+        map_data = load_arena()
+    global_fire = None
+    with timed('build actions'):
+        action_dict = make_action_dictionary()
     # make a list of the coordinates of every blocking, non-mobile object
 
+    first_frame = True
+
     # while the user has not pressed 'q', display the map
     while not global_quit:
         blocking_objects = [(mx, my) for mx, my, map_object in map_data if map_object.get_blocks() and not map_object.get_mobile()]
         map_data = decrement_cooldowns(map_data)
 
-        stdscr.clear()
-        display_map(stdscr, map_data)
-        display_conditions(stdscr, map_data)
-        player = extract_map_object(map_data, PLAYER_SYMBOL)
-
-        # get list of all valid actions for player
-        valid_actions = [key for key in action_dict if not action_dict[key][1](map_data, player[2].get_symbol())]
-
-        display_valid_actions(stdscr, action_dict, map_data, valid_actions)
-        display_log(stdscr)
+        valid_actions = draw_frame(stdscr, action_dict, map_data)
 
         player = extract_map_object(map_data, PLAYER_SYMBOL)
         dragon = extract_map_object(map_data, DRAGON_SYMBOL)
 
         stdscr.refresh()
+        if profile_startup:
+            first_frame_drawn()
+            return
+        if first_frame:
+            warm_imports()
+            first_frame = False
 
         if game_over(stdscr, map_data):
             break
@@ -512,6 +656,126 @@ def main(stdscr):
         # determine dragon action
         map_data = determine_dragon_action(action_dict, map_data, dragon, player, blocking_objects)
 
+def realtime_main(stdscr, ticks_per_second: int = DEFAULT_TICKS_PER_SECOND, frames_per_second: int = DEFAULT_FRAMES_PER_SECOND, profile_startup: bool = False):
+    # play the encounter in real time. the simulation advances ticks_per_second times a second
+    # whether or not a key is pressed: each tick counts down the cooldowns and lets the dragon act,
+    # so move_timer and breath_timer are real speeds. the player may act once per tick.
+    # the screen is redrawn only when something changed, at most frames_per_second times a second,
+    # and between ticks and frames the loop sleeps in getch so an idle game uses no CPU.
+    global global_quit, global_log, global_fire
+    with timed('load arena'):
+        map_data = load_arena()
+    global_fire = None
+    with timed('build actions'):
+        action_dict = make_action_dictionary()
+    tick_length = 1 / ticks_per_second
+    frame_length = 1 / frames_per_second
+
+    next_tick = next_frame = time.perf_counter()
+    pending_key = None      # (key, time it was pressed) of an action not yet applied
+    player_acted = False    # the player has already acted during this tick
+    unshown_presses = []    # press times of applied actions not yet drawn
+    latencies = []          # seconds from a key press to the frame showing its effect
+    dirty = True
+    first_frame = True
+
+    while not global_quit:
+        now = time.perf_counter()
+        # if the loop fell far behind (e.g. the terminal was suspended), don't try to catch up
+        if now - next_tick > 1:
+            next_tick = now
+        while now >= next_tick:
+            next_tick += tick_length
+            blocking_objects = [(mx, my) for mx, my, map_object in map_data if map_object.get_blocks() and not map_object.get_mobile()]
+            with recording() as changed:
+                map_data = decrement_cooldowns(map_data)
+                player = extract_map_object(map_data, PLAYER_SYMBOL)
+                dragon = extract_map_object(map_data, DRAGON_SYMBOL)
+                map_data = determine_dragon_action(action_dict, map_data, dragon, player, blocking_objects)
+            player_acted = False
+            dirty = dirty or changed()
+
+        if pending_key is not None and not player_acted:
+            key, pressed = pending_key
+            pending_key = None
+            if key in action_dict and not action_dict[key][1](map_data, PLAYER_SYMBOL):
+                with recording() as changed:
+                    map_data = action_dict[key][0](map_data, PLAYER_SYMBOL)
+                player_acted = True
+                if changed():
+                    unshown_presses.append(pressed)
+                    dirty = True
+                if global_quit:
+                    break
+
+        if dirty and now >= next_frame:
+            draw_frame(stdscr, action_dict, map_data)
+            if latencies:
+                stdscr.addstr(16, 0, f"Input latency: {1000 * latencies[-1]:.1f} ms (average {1000 * sum(latencies) / len(latencies):.1f} ms)")
+            stdscr.refresh()
+            if profile_startup:
+                first_frame_drawn()
+                return
+            drawn = time.perf_counter()
+            if first_frame:
+                warm_imports()
+                first_frame = False
+            latencies.extend(drawn - pressed for pressed in unshown_presses)
+            unshown_presses = []
+            next_frame = now + frame_length
+            dirty = False
+            if game_over(stdscr, map_data):
+                break
+
+        # sleep until the next tick or frame is due, or a key is pressed. round up, so the
+        # loop does not wake just before it is due and then spin with a zero timeout.
+        wake = min(next_tick, next_frame) if dirty else next_tick
+        stdscr.timeout(max(0, math.ceil(1000 * (wake - time.perf_counter()))))
+        key = stdscr.getch()
+        if key != -1 and 0 <= key < 256:
+            pending_key = (chr(key), time.perf_counter())
+
+def positive_int(value: str) -> int:
+    # argparse type for the tick and frame rates
+    number = int(value)
+    if number <= 0:
+        raise ValueError(f"{value} is not a positive number")
+    return number
+
+def warm_imports():
+    # import fireField (and numpy with it) once the first frame is on screen, rather than
+    # when the dragon first breathes fire, where it would stall a turn or a real-time tick
+    import fireField
+
+def first_frame_drawn():
+    # measured from when encounter.py started running: interpreter (or bundle) startup is not included
+    startup_timings.append(('time to first frame', time.perf_counter() - launch_time))
+
+def report_startup(budget_ms: int) -> int:
+    # print the startup timings. return 1 if the first frame took longer than budget_ms, 0 otherwise.
+    for step, seconds in startup_timings:
+        print(f"{step:<24}{1000 * seconds:8.2f} ms")
+    time_to_first_frame = 1000 * startup_timings[-1][1]
+    if time_to_first_frame > budget_ms:
+        print(f"Time to first frame is over the budget of {budget_ms} ms")
+        return 1
+    return 0
 
 if __name__ == '__main__':
-    curses.wrapper(main)
+    with timed('import argparse'):
+        import argparse
+    parser = argparse.ArgumentParser(description="A single encounter roguelike.")
+    parser.add_argument('--realtime', action='store_true', help="play in real time instead of turn by turn")
+    parser.add_argument('--ticks-per-second', type=positive_int, default=DEFAULT_TICKS_PER_SECOND, help="simulation speed in real-time mode")
+    parser.add_argument('--fps', type=positive_int, default=DEFAULT_FRAMES_PER_SECOND, help="maximum frame rate in real-time mode")
+    parser.add_argument('--startup-profile', action='store_true', help="draw the first frame, quit, and report how long each step of starting up took")
+    parser.add_argument('--startup-budget', type=int, default=STARTUP_BUDGET_MS, help="with --startup-profile, exit with an error if the first frame takes longer than this many milliseconds")
+    args = parser.parse_args()
+    with timed('import curses'):
+        import curses
+    if args.realtime:
+        curses.wrapper(realtime_main, args.ticks_per_second, args.fps, args.startup_profile)
+    else:
+        curses.wrapper(main, args.startup_profile)
+    if args.startup_profile:
+        raise SystemExit(report_startup(args.startup_budget))
@@ -0,0 +1,87 @@
+import random
+import numpy as np
+from mapObject import set_journaled
+
+SPREAD_CHANCE = 0.3
+WOOD_FUEL = 8
+
+def any_neighbour(grid: np.ndarray) -> np.ndarray:
+    # return a boolean grid that is True wherever an orthogonal neighbour of the cell is set.
+    result = np.zeros(grid.shape, dtype=bool)
+    result[1:, :] |= grid[:-1, :]
+    result[:-1, :] |= grid[1:, :]
+    result[:, 1:] |= grid[:, :-1]
+    result[:, :-1] |= grid[:, 1:]
+    return result
+
+class FireField():
+    # burning terrain, simulated as a cellular automaton over the map grid. wood (walls and
+    # doors) burns for WOOD_FUEL ticks and then is gone; fire spreads to neighbouring wood,
+    # and never survives next to water. grids are indexed [y, x] and replaced rather than
+    # modified, so the undo journal only has to keep a reference to the old ones.
+    def __init__(self, map_data: list):
+        width = max([x for x, _, _ in map_data]) + 1
+        height = max([y for _, y, _ in map_data]) + 1
+        self.flammable = np.zeros((height, width), dtype=bool)
+        water = np.zeros((height, width), dtype=bool)
+        for x, y, map_object in map_data:
+            if map_object.get_is_wood() or map_object.get_openable():
+                self.flammable[y, x] = True
+            if map_object.get_wet():
+                water[y, x] = True
+        # water does not move, so the cells it protects can be worked out once
+        self.quenched = water | any_neighbour(water)
+        self.fuel = np.where(self.flammable, WOOD_FUEL, 0).astype(np.int16)
+        self.burning = np.zeros((height, width), dtype=bool)
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        height, width = self.burning.shape
+        return 0 <= x < width and 0 <= y < height
+
+    def get_is_burning(self, x: int, y: int) -> bool:
+        return self.in_bounds(x, y) and bool(self.burning[y, x])
+
+    def ignite(self, x: int, y: int) -> bool:
+        # set the cell at (x, y) alight. return True if it caught fire.
+        if not self.in_bounds(x, y) or not self.flammable[y, x] or self.burning[y, x] or self.quenched[y, x]:
+            return False
+        burning = self.burning.copy()
+        burning[y, x] = True
+        set_journaled(self, 'burning', burning)
+        return True
+
+    def remove_fuel(self, x: int, y: int):
+        # the wood at (x, y) is gone (opened, bashed or burnt away): it can no longer burn
+        if not self.in_bounds(x, y) or not (self.flammable[y, x] or self.burning[y, x]):
+            return
+        flammable = self.flammable.copy()
+        flammable[y, x] = False
+        burning = self.burning.copy()
+        burning[y, x] = False
+        fuel = self.fuel.copy()
+        fuel[y, x] = 0
+        set_journaled(self, 'flammable', flammable)
+        set_journaled(self, 'burning', burning)
+        set_journaled(self, 'fuel', fuel)
+
+    def tick(self) -> np.ndarray:
+        # advance the fire by one tick. return a boolean grid of the cells that burned away.
+        if not self.burning.any():
+            return np.zeros(self.burning.shape, dtype=bool)
+        burning = self.burning
+        fuel = self.fuel - burning
+        burnt_out = burning & (fuel <= 0)
+        # seeded from the game's random module, so random.seed makes the fire repeatable too
+        rolls = np.random.default_rng(random.getrandbits(64)).random(burning.shape)
+        spread = any_neighbour(burning) & self.flammable & ~burning & (rolls < SPREAD_CHANCE)
+        set_journaled(self, 'fuel', fuel)
+        set_journaled(self, 'flammable', self.flammable & ~burnt_out)
+        set_journaled(self, 'burning', ((burning & ~burnt_out) | spread) & ~self.quenched)
+        return burnt_out
+
+    def get_heat(self) -> np.ndarray:
+        # return a boolean grid of the cells that are burning or next to a burning cell
+        return self.burning | any_neighbour(self.burning)
+
+    def get_burning_cells(self) -> list:
+        return [(int(x), int(y)) for y, x in zip(*np.nonzero(self.burning))]
@@ -61,25 +61,93 @@ class Shield():
 PLAYER_SYMBOL = '@'
 DRAGON_SYMBOL = 'D'    
 
+# the catalogs never change, so they are built once when the module is imported
+WEAPONS = (
+    Weapon('your bare hands', 0, 1),
+    Weapon('a melted sword', 1, 1),
+    Weapon('an untempered sword', 2, 1, can_be_tempered=True),
+    Weapon('a tempered sword', 5, 1, is_tempered=True, can_be_blessed=True),
+    Weapon('Excalibur', 100, 1, is_blessed=True, is_tempered=True),
+    Weapon('dragon teeth', 2, 1, can_be_blessed=True, is_tempered=True),
+    Weapon('adamantine teeth', 2, 1, is_blessed=True, is_tempered=True),
+)
+
+SHIELDS = (
+    Shield('no shield', 0, 0),
+    Shield('a piece of wooden wall', 2, 60),
+    Shield('a wooden shield', 2, 50),
+    Shield('a bolstered wooden shield', 3, 20),
+    Shield('a wooden kite shield', 5, 10),
+)
+
 def getWeapons():
-    weapons = []
-    weapons.append(Weapon('your bare hands', 0, 1))
-    weapons.append(Weapon('a melted sword', 1, 1))
-    weapons.append(Weapon('an untempered sword', 2, 1, can_be_tempered=True))
-    weapons.append(Weapon('a tempered sword', 5, 1, is_tempered=True, can_be_blessed=True))
-    weapons.append(Weapon('Excalibur', 100, 1, is_blessed=True, is_tempered=True))
-    weapons.append(Weapon('dragon teeth', 2, 1, can_be_blessed=True, is_tempered=True))
-    weapons.append(Weapon('adamantine teeth', 2, 1, is_blessed=True, is_tempered=True))
-    return weapons
+    return WEAPONS
 
 def getShields():
-    shields = []
-    shields.append(Shield('no shield', 0, 0))
-    shields.append(Shield('a piece of wooden wall', 2, 60))
-    shields.append(Shield('a wooden shield', 2, 50))
-    shields.append(Shield('a bolstered wooden shield', 3, 20))
-    shields.append(Shield('a wooden kite shield', 5, 10))
-    return shields
+    return SHIELDS
+
+class Journal():
+    # an undo journal. while a journal is active, every change made through a setter,
+    # to a map_data list or to the message log is recorded, so a turn (or any number
+    # of them) can be reverted in time proportional to the number of changes.
+    def __init__(self):
+        self.entries = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def mark(self) -> int:
+        # return a checkpoint that can later be passed to undo
+        return len(self.entries)
+
+    def record_attribute(self, obj, attribute: str):
+        self.entries.append(('attribute', obj, attribute, getattr(obj, attribute)))
+
+    def record_replace(self, container: list, index: int):
+        self.entries.append(('replace', container, index, container[index]))
+
+    def record_delete(self, container: list, index: int):
+        self.entries.append(('delete', container, index, container[index]))
+
+    def record_append(self, container: list):
+        self.entries.append(('append', container, None, None))
+
+    def record_contents(self, container: list):
+        # record the whole list, for changes touching too many entries to record one by one
+        self.entries.append(('contents', container, None, list(container)))
+
+    def undo(self, mark: int = 0):
+        # revert every change recorded after the checkpoint, newest first
+        while len(self.entries) > mark:
+            kind, target, key, value = self.entries.pop()
+            if kind == 'attribute':
+                setattr(target, key, value)
+            elif kind == 'replace':
+                target[key] = value
+            elif kind == 'delete':
+                target.insert(key, value)
+            elif kind == 'append':
+                target.pop()
+            elif kind == 'contents':
+                target[:] = value
+
+active_journal = None
+
+def set_journal(journal: Journal) -> Journal:
+    # make journal the active journal (None to stop recording). return the previous one.
+    global active_journal
+    previous = active_journal
+    active_journal = journal
+    return previous
+
+def get_journal() -> Journal:
+    return active_journal
+
+def set_journaled(obj, attribute: str, value):
+    # set an attribute, recording the old value in the active journal
+    if active_journal is not None:
+        active_journal.record_attribute(obj, attribute)
+    setattr(obj, attribute, value)
 
 class MapObject():
     def __init__(self, name: str, symbol: str, blocks=False, destructible=False, wet=False, mobile=False, openable=False,
@@ -140,19 +208,19 @@ class MapObject():
         return self.is_wet
     
     def set_is_wet(self, is_wet: bool):
-        self.is_wet = is_wet
+        set_journaled(self, 'is_wet', is_wet)
     
     def get_is_burning(self) -> bool:
         return self.is_burning
     
     def set_is_burning(self, is_burning: bool):
-        self.is_burning = is_burning
+        set_journaled(self, 'is_burning', is_burning)
     
     def get_is_blessed(self) -> bool:
         return self.is_blessed
     
     def set_is_blessed(self, is_blessed: bool):
-        self.is_blessed = is_blessed
+        set_journaled(self, 'is_blessed', is_blessed)
     
     def get_move_timer(self) -> int:
         return self.move_timer
@@ -161,7 +229,7 @@ class MapObject():
         return self.move_cooldown
     
     def set_move_cooldown(self, move_cooldown: int):
-        self.move_cooldown = move_cooldown
+        set_journaled(self, 'move_cooldown', move_cooldown)
 
     def get_has_shield(self) -> bool:
         return self.shield > 0
@@ -170,13 +238,13 @@ class MapObject():
         return self.shield
     
     def set_shield(self, shield_index: int):
-        self.shield = max(0, shield_index)
+        set_journaled(self, 'shield', max(0, shield_index))
     
     def get_carrying_ore(self) -> bool:
         return self.carrying_ore
     
     def set_carrying_ore(self, carrying_ore: bool):
-        self.carrying_ore = carrying_ore
+        set_journaled(self, 'carrying_ore', carrying_ore)
         
     def get_is_ore(self) -> bool:
         return self.is_ore
@@ -185,7 +253,7 @@ class MapObject():
         return self.weapon
     
     def set_weapon(self, weapon_index: int):
-        self.weapon = weapon_index
+        set_journaled(self, 'weapon', weapon_index)
     
     def get_is_wood(self) -> bool:
         return self.is_wood
@@ -197,7 +265,7 @@ class MapObject():
         return self.breath_cooldown
     
     def set_breath_cooldown(self, breath_cooldown: int):
-        self.breath_cooldown = breath_cooldown
+        set_journaled(self, 'breath_cooldown', breath_cooldown)
     
     def get_breath_range(self) -> int:
         return self.breath_range
@@ -209,7 +277,7 @@ class MapObject():
         return self.health
     
     def set_health(self, health: int):
-        self.health = max(0, health)
+        set_journaled(self, 'health', max(0, health))
     
 def getMapObjects():
     map_objects = {}
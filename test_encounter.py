@@ -0,0 +1,318 @@
+import os
+import random
+import subprocess
+import sys
+import pytest
+import encounter
+import fireField
+from mapObject import getMapObjects, PLAYER_SYMBOL, DRAGON_SYMBOL
+
+@pytest.fixture
+def map_data():
+    # a fresh default arena, with the module's game state reset
+    encounter.global_quit = False
+    encounter.global_log = []
+    encounter.global_fire = None
+    return encounter.load_map('map.txt')
+
+def snapshot(map_data: list) -> tuple:
+    # everything a turn can change: object positions and state, the log and the quit flag
+    return ([(x, y, id(map_object), dict(vars(map_object))) for x, y, map_object in map_data],
+            list(encounter.global_log), encounter.global_quit)
+
+def play_turns(map_data: list, turns: int) -> list:
+    # play random valid actions for both mobs, quitting on the last turn
+    action_dict = encounter.make_action_dictionary()
+    for _ in range(turns):
+        for symbol in (PLAYER_SYMBOL, DRAGON_SYMBOL):
+            valid_actions = [key for key in action_dict if not action_dict[key][1](map_data, symbol) and key != 'Q']
+            map_data = action_dict[random.choice(valid_actions)][0](map_data, symbol)
+        map_data = encounter.decrement_cooldowns(map_data)
+    return encounter.set_quit(map_data)
+
+def test_fork_restores_world(map_data):
+    random.seed(26)
+    before = snapshot(map_data)
+    with encounter.fork() as journal:
+        forked = play_turns(map_data, 50)
+        assert len(journal) > 0
+        assert encounter.global_quit
+    assert forked is map_data
+    assert snapshot(map_data) == before
+
+def test_nested_fork_restores_outer_changes(map_data):
+    random.seed(27)
+    before = snapshot(map_data)
+    with encounter.fork():
+        play_turns(map_data, 5)
+        middle = snapshot(map_data)
+        with encounter.fork():
+            play_turns(map_data, 5)
+        assert snapshot(map_data) == middle
+    assert snapshot(map_data) == before
+
+def test_opened_door_cannot_burn(map_data):
+    fire = encounter.get_fire(map_data)
+    map_data = encounter.move_map_object(map_data, PLAYER_SYMBOL, 7, 13)
+    map_data = encounter.open_door(map_data, PLAYER_SYMBOL)
+    assert not fire.ignite(6, 13)
+
+def test_bashed_wall_stops_burning(map_data):
+    fire = encounter.get_fire(map_data)
+    assert fire.ignite(3, 12)
+    wall = [motuple for motuple in map_data if motuple[:2] == (3, 12)][0]
+    encounter.remove_map_object(map_data, wall)
+    assert not fire.get_is_burning(3, 12)
+    assert (3, 12) not in fire.get_burning_cells()
+
+def test_fire_started_in_fork_is_undone(map_data):
+    with encounter.fork():
+        map_data = encounter.move_map_object(map_data, PLAYER_SYMBOL, 7, 13)
+        map_data = encounter.open_door(map_data, PLAYER_SYMBOL)
+        encounter.get_fire(map_data)
+    assert encounter.global_fire is None
+    assert encounter.get_fire(map_data).ignite(6, 13)
+
+def test_fork_restores_fire(map_data):
+    random.seed(28)
+    map_data = encounter.move_map_object(map_data, PLAYER_SYMBOL, 3, 11)
+    map_data = encounter.breathe_fire(map_data, DRAGON_SYMBOL)
+    fire = encounter.global_fire
+    before = snapshot(map_data), fire.get_burning_cells(), fire.flammable.copy(), fire.fuel.copy()
+    with encounter.fork():
+        for _ in range(30):
+            map_data = encounter.decrement_cooldowns(map_data)
+    assert encounter.global_fire is fire
+    after = snapshot(map_data), fire.get_burning_cells(), fire.flammable, fire.fuel
+    assert after[:2] == before[:2]
+    assert (after[2] == before[2]).all() and (after[3] == before[3]).all()
+
+def test_breath_ignites_wood_next_to_target(map_data):
+    # the player stands just above the wooden wall at (3, 12)
+    map_data = encounter.move_map_object(map_data, PLAYER_SYMBOL, 3, 11)
+    map_data = encounter.breathe_fire(map_data, DRAGON_SYMBOL)
+    assert encounter.global_fire.get_burning_cells() == [(3, 12)]
+
+def test_fire_spreads_to_neighbouring_wood(map_data, monkeypatch):
+    monkeypatch.setattr(fireField, 'SPREAD_CHANCE', 1.0)
+    fire = encounter.get_fire(map_data)
+    fire.ignite(3, 12)
+    fire.tick()
+    assert fire.get_burning_cells() == [(2, 12), (3, 12), (4, 12)]
+
+def test_wood_burns_away_after_its_fuel(map_data, monkeypatch):
+    monkeypatch.setattr(fireField, 'SPREAD_CHANCE', 0.0)
+    fire = encounter.get_fire(map_data)
+    fire.ignite(3, 12)
+    for _ in range(fireField.WOOD_FUEL - 1):
+        map_data = encounter.spread_fire(map_data)
+    assert fire.get_is_burning(3, 12)
+    assert any(motuple[:2] == (3, 12) for motuple in map_data)
+    map_data = encounter.spread_fire(map_data)
+    assert not fire.get_is_burning(3, 12)
+    assert not any(motuple[:2] == (3, 12) for motuple in map_data)
+
+def test_water_and_its_neighbours_never_burn(monkeypatch):
+    monkeypatch.setattr(fireField, 'SPREAD_CHANCE', 1.0)
+    map_objects = getMapObjects()
+    # a wooden wall running up to a pool: -----~
+    fire = fireField.FireField([(x, 0, map_objects['-']) for x in range(5)] + [(5, 0, map_objects['~'])])
+    assert not fire.ignite(4, 0)
+    assert not fire.ignite(5, 0)
+    assert fire.ignite(0, 0)
+    for _ in range(fireField.WOOD_FUEL - 1):
+        fire.tick()
+    assert fire.get_burning_cells() == [(x, 0) for x in range(4)]
+
+def test_flames_hurt_mobs_next_to_them(map_data, monkeypatch):
+    monkeypatch.setattr(fireField, 'SPREAD_CHANCE', 0.0)
+    monkeypatch.setattr(encounter, 'BURN_CHANCE', 1.0)
+    map_data = encounter.move_map_object(map_data, PLAYER_SYMBOL, 3, 11)
+    encounter.get_fire(map_data).ignite(3, 12)
+    map_data = encounter.spread_fire(map_data)
+    assert encounter.extract_map_object(map_data, PLAYER_SYMBOL)[2].get_health() == 9
+
+def test_flames_dry_wet_mobs_instead(map_data, monkeypatch):
+    monkeypatch.setattr(fireField, 'SPREAD_CHANCE', 0.0)
+    monkeypatch.setattr(encounter, 'BURN_CHANCE', 1.0)
+    map_data = encounter.move_map_object(map_data, PLAYER_SYMBOL, 3, 11)
+    player = encounter.extract_map_object(map_data, PLAYER_SYMBOL)[2]
+    player.set_is_wet(True)
+    encounter.get_fire(map_data).ignite(3, 12)
+    map_data = encounter.spread_fire(map_data)
+    assert not player.get_is_wet()
+    assert player.get_health() == 10
+
+def test_flames_do_not_hurt_the_dragon(map_data, monkeypatch):
+    monkeypatch.setattr(fireField, 'SPREAD_CHANCE', 0.0)
+    monkeypatch.setattr(encounter, 'BURN_CHANCE', 1.0)
+    map_data = encounter.move_map_object(map_data, DRAGON_SYMBOL, 3, 11)
+    encounter.get_fire(map_data).ignite(3, 12)
+    map_data = encounter.spread_fire(map_data)
+    dragon = encounter.extract_map_object(map_data, DRAGON_SYMBOL)[2]
+    assert dragon.get_health() == dragon.get_max_health()
+
+def test_fire_follows_random_seed(map_data):
+    fire = encounter.get_fire(map_data)
+    fire.ignite(3, 12)
+    runs = []
+    for _ in range(2):
+        random.seed(27)
+        with encounter.fork():
+            for _ in range(6):
+                fire.tick()
+            runs.append(fire.get_burning_cells())
+    assert runs[0] == runs[1]
+
+@pytest.mark.parametrize('value', ['0', '-1', 'fast'])
+def test_rates_must_be_positive(value):
+    with pytest.raises(ValueError):
+        encounter.positive_int(value)
+
+def test_recording_keeps_changes(map_data):
+    with encounter.recording() as changed:
+        assert not changed()
+        map_data = encounter.move_mob(map_data, PLAYER_SYMBOL, 0, -1)
+    assert changed()
+    assert encounter.extract_map_object(map_data, PLAYER_SYMBOL)[:2] == (9, 12)
+
+def test_recording_inside_fork_is_undone(map_data):
+    before = snapshot(map_data)
+    with encounter.fork() as journal:
+        map_data = encounter.move_mob(map_data, PLAYER_SYMBOL, 0, -1)
+        with encounter.recording() as changed:
+            assert not changed()
+            map_data = encounter.move_mob(map_data, PLAYER_SYMBOL, 0, -1)
+        assert changed()
+        assert encounter.get_journal() is journal
+    assert encounter.get_journal() is None
+    assert snapshot(map_data) == before
+
+class ScriptedScreen():
+    # a stand-in curses window and clock for realtime_main. getch advances the clock by its
+    # timeout instead of sleeping, and returns each scripted (time, key) when its time comes.
+    # every clock reading also moves time on a little, as real work would.
+    def __init__(self, keys: list):
+        self.now = 0.0
+        self.keys = list(keys)
+        self.wait_ms = -1
+        self.timeouts = []
+        self.frames = []
+        self.lines = []
+
+    def perf_counter(self) -> float:
+        self.now += 0.00005
+        return self.now
+
+    def timeout(self, ms: int):
+        self.wait_ms = ms
+        self.timeouts.append(ms)
+
+    def getch(self) -> int:
+        if self.keys and (self.wait_ms < 0 or self.keys[0][0] <= self.now + self.wait_ms / 1000):
+            at, key = self.keys.pop(0)
+            self.now = max(self.now, at)
+            return ord(key)
+        self.now += self.wait_ms / 1000
+        return -1
+
+    def erase(self):
+        self.frames.append(self.now)
+
+    def addch(self, y, x, ch):
+        pass
+
+    def addstr(self, y, x, text):
+        self.lines.append(text)
+
+    def refresh(self):
+        pass
+
+@pytest.fixture
+def realtime(map_data, monkeypatch):
+    # run realtime_main on a ScriptedScreen, with a dragon that does nothing and a test action
+    # 'x' that always changes the world. returns the screen, the tick times and the 'x' times.
+    ticks, actions = [], []
+    def run(keys: list, ticks_per_second: int = 4, frames_per_second: int = 30, dragon_acts: bool = False) -> tuple:
+        screen = ScriptedScreen(keys)
+        decrement_cooldowns = encounter.decrement_cooldowns
+        def counted_decrement_cooldowns(map_data):
+            ticks.append(screen.now)
+            return decrement_cooldowns(map_data)
+        def dragon_action(action_dict, map_data, dragon, player, blocking_objects):
+            if dragon_acts:
+                encounter.log(DRAGON_SYMBOL, "The dragon paces.", "You pace.")
+            return map_data
+        make_action_dictionary = encounter.make_action_dictionary
+        def action_dictionary():
+            action_dict = make_action_dictionary()
+            action_dict['x'] = (lambda map_data, symbol: actions.append(screen.now) or encounter.log(symbol, "You act.") or map_data, lambda map_data, symbol: False, "test")
+            return action_dict
+        monkeypatch.setattr(encounter, 'time', screen)
+        monkeypatch.setattr(encounter, 'decrement_cooldowns', counted_decrement_cooldowns)
+        monkeypatch.setattr(encounter, 'determine_dragon_action', dragon_action)
+        monkeypatch.setattr(encounter, 'make_action_dictionary', action_dictionary)
+        encounter.realtime_main(screen, ticks_per_second, frames_per_second)
+        return screen, ticks, actions
+    return run
+
+def test_realtime_ticks_at_a_fixed_rate(realtime):
+    _, ticks, _ = realtime([(10.0, 'Q')], ticks_per_second=4)
+    assert 40 <= len(ticks) <= 42
+    assert all(abs(later - earlier - 0.25) < 0.002 for earlier, later in zip(ticks, ticks[1:]))
+
+def test_realtime_idle_game_neither_redraws_nor_spins(realtime):
+    screen, ticks, _ = realtime([(10.0, 'Q')], ticks_per_second=4)
+    assert len(screen.frames) == 1
+    # one sleep per tick, give or take; never a run of zero timeouts
+    assert len(screen.timeouts) <= len(ticks) + 2
+    assert screen.timeouts.count(0) <= 1
+
+def test_realtime_redraws_after_a_change(realtime):
+    screen, _, actions = realtime([(1.1, 'x'), (3.0, 'Q')], ticks_per_second=4)
+    assert len(actions) == 1
+    assert len(screen.frames) == 2
+    assert screen.frames[1] >= actions[0]
+
+def test_realtime_player_acts_once_per_tick(realtime):
+    keys = [(1.01 + 0.02 * press, 'x') for press in range(10)] + [(3.0, 'Q')]
+    _, _, actions = realtime(keys, ticks_per_second=4)
+    assert actions
+    tick_numbers = [int(at / 0.25) for at in actions]
+    assert len(tick_numbers) == len(set(tick_numbers))
+
+def test_realtime_frame_rate_is_capped(realtime):
+    screen, ticks, _ = realtime([(2.0, 'Q')], ticks_per_second=100, frames_per_second=10, dragon_acts=True)
+    assert len(ticks) >= 190
+    assert len(screen.frames) <= 21
+    assert all(later - earlier >= 0.1 for earlier, later in zip(screen.frames, screen.frames[1:]))
+
+def test_realtime_measures_input_latency(realtime):
+    # a press's latency is known once its frame is drawn, so it shows on the frame after that
+    screen, _, actions = realtime([(1.1, 'x'), (2.1, 'x'), (3.0, 'Q')], ticks_per_second=4)
+    latency_lines = [line for line in screen.lines if line.startswith("Input latency:")]
+    assert actions and latency_lines
+    assert float(latency_lines[-1].split()[2]) < 5
+
+def test_default_arena_matches_map_file(map_data):
+    from arena import DEFAULT_ARENA
+    assert tuple((x, y, map_object.get_symbol()) for x, y, map_object in map_data) == DEFAULT_ARENA
+
+# a cold launch: import the game, load the arena and draw the first frame on a stand-in screen
+FIRST_FRAME_SCRIPT = """
+import time
+began = time.perf_counter()
+import encounter
+class Screen():
+    def erase(self): pass
+    def addch(self, y, x, ch): pass
+    def addstr(self, y, x, text): pass
+encounter.draw_frame(Screen(), encounter.make_action_dictionary(), encounter.load_arena())
+print(1000 * (time.perf_counter() - began))
+"""
+def test_time_to_first_frame():
+    here = os.path.dirname(os.path.abspath(__file__))
+    # the first launch may have to write bytecode caches, so it is not counted; take the best of the rest
+    timings = [float(subprocess.run([sys.executable, '-c', FIRST_FRAME_SCRIPT], cwd=here, capture_output=True, text=True, check=True).stdout)
+               for _ in range(4)]
+    assert min(timings[1:]) < encounter.STARTUP_BUDGET_MS